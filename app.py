@@ -1,22 +1,41 @@
 import gradio as gr
-from modules.music_generator import generate_music
 from datasets.monuments import load_monuments, match_monument_by_name
+from modules import thumbnails
 import json, os
-from PIL import Image, ImageDraw, ImageFont
 import numpy as np
+import scipy.io.wavfile
+
+# Set FAST_GENERATOR=1 to replace MusicGen with a stub that writes a plain tone
+# (frontend testing and loadtest.py); the real models are then never imported.
+FAST_GENERATOR = os.environ.get("FAST_GENERATOR") == "1"
+
+if FAST_GENERATOR:
+    def generate_music(caption: str, output_path="generated.wav", duration_sec: int = 15, **kwargs):
+        # Same sample rate and float32 format as MusicGen, so responses have a realistic size
+        sampling_rate = 32000
+        t = np.arange(int(sampling_rate * duration_sec), dtype=np.float32) / sampling_rate
+        scipy.io.wavfile.write(output_path, sampling_rate, 0.1 * np.sin(2 * np.pi * 440 * t, dtype=np.float32))
+        return output_path
+else:
+    from modules.music_generator import generate_music, warm_up_prompt_cache
+from PIL import Image, ImageDraw, ImageFont
 import math
 
 
 def build_markers_json():
     monuments = load_monuments()
+    variants = thumbnails.build_all("datasets/" + m["image"] for m in monuments if m.get("image"))
     markers = []
     for m in monuments:
         if m.get("lat") is not None and m.get("lon") is not None:
+            image = m.get("image")
+            thumb = variants.get("datasets/" + image, {}).get("thumb") if image else None
             markers.append({
                 "name": m["nume"],
                 "lat": m["lat"],
                 "lon": m["lon"],
-                "image": m.get("image"),
+                # map.html lives in assets/, so popup images are relative to it
+                "image": os.path.relpath(thumb, "assets") if thumb else image,
                 "desc": m.get("descriere", "")
             })
     return json.dumps(markers)
@@ -196,10 +215,9 @@ def draw_markers_on_image(evt: gr.SelectData, img_input):
 def process_monument_ui(monument_name):
     monument = match_monument_by_name(monument_name)
     caption = monument.get("descriere","")
-    image = "datasets/" + monument.get("image")
-    music_path = generate_music(caption, output_path="assets/generated_music.wav")
-    ## Uncomment the next line for fast testing the frontend
-    # music_path = "assets/generated_music.wav" #generate_music(caption, output_path="assets/generated_music.wav")
+    image = thumbnails.get_variant("datasets/" + monument.get("image"), "card")
+    music_path = generate_music(caption, output_path="assets/generated_music.wav", monument=monument["nume"])
+    ## Run with FAST_GENERATOR=1 for fast testing the frontend
     return caption, music_path, image
 
 lat_max, lat_min = 48.27, 43.63
@@ -273,4 +291,13 @@ with gr.Blocks(css="body {background: linear-gradient(to right,#f0f4ff,#d9e4ff);
     """
     gr.HTML(js_bridge)
 
+# Set WARMUP_PROMPT_CACHE=1 to precompute the text encodings of all monument prompts at startup
+if os.environ.get("WARMUP_PROMPT_CACHE") == "1" and not FAST_GENERATOR:
+    warm_up_prompt_cache()
+
+# Queue settings, tunable with loadtest.py
+demo.queue(
+    default_concurrency_limit=int(os.environ.get("GRADIO_CONCURRENCY_LIMIT", "1")),
+    max_size=int(os.environ["GRADIO_QUEUE_MAX_SIZE"]) if os.environ.get("GRADIO_QUEUE_MAX_SIZE") else None,
+)
 demo.launch(allowed_paths=["."])
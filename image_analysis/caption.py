@@ -1,7 +1,9 @@
-from transformers import pipeline
+from modules import model_registry
 from PIL import Image
 import os
 
+captioner_id = "Salesforce/blip-image-captioning-large"
+
 def generate_caption(image_path: str) -> str:
     """
     Generează o descriere scurtă a imaginii.
@@ -10,6 +12,6 @@ def generate_caption(image_path: str) -> str:
         raise FileNotFoundError(f"Image not found: {image_path}")
 
     image = Image.open(image_path).convert("RGB")
-    captioner = pipeline("image-to-text", model="Salesforce/blip-image-captioning-large")
-    result = captioner(image)[0]["generated_text"]
+    with model_registry.use(captioner_id, model_registry.pipeline_loader("image-to-text")) as captioner:
+        result = captioner(image)[0]["generated_text"]
     return result
@@ -1,11 +1,12 @@
-from transformers import pipeline
+from modules import model_registry
 
-story_model = pipeline("text-generation", model="gpt2", max_length=200)
+story_model_id = "gpt2"
 
 def generate_story(caption: str) -> str:
     """
     Generează o poveste scurtă pe baza caption-ului (doar pentru afișare).
     """
     prompt = f"Write a short story (4-6 sentences) based on this image description: {caption}"
-    result = story_model(prompt)[0]["generated_text"]
+    with model_registry.use(story_model_id, model_registry.pipeline_loader("text-generation")) as story_model:
+        result = story_model(prompt, max_length=200)[0]["generated_text"]
     return result.strip()
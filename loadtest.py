@@ -0,0 +1,265 @@
+"""
+Load test for the Gradio app.
+
+Starts app.py with the stub generator (FAST_GENERATOR=1) and simulates N concurrent
+users doing map clicks and music generation requests. A click fires handle_click and
+draw_markers_on_image concurrently, as the browser does. Selecting a monument in the
+dropdown is not exercised as a request: app.py has no listener on it, so it never
+reaches the server; the chosen name is only the input of the generation request.
+Reports p50/p95/p99 latency, throughput and error rate per operation.
+
+    python loadtest.py --users 20 --iterations 10
+    GRADIO_CONCURRENCY_LIMIT=4 python loadtest.py --users 20
+    python loadtest.py --url http://127.0.0.1:7860 --users 5   # already running app
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datasets.monuments import load_monuments
+from gradio_client import Client
+from PIL import Image
+import numpy as np
+import argparse
+import httpx
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+MAP_IMAGE = "assets/harta_romaniei.jpg"
+
+
+def start_app(port: int, timeout_sec: float = 120):
+    """
+    Launch app.py with the stub generator and wait until it answers.
+    """
+    env = dict(os.environ, FAST_GENERATOR="1", GRADIO_SERVER_PORT=str(port))
+    proc = subprocess.Popen([sys.executable, "app.py"], env=env)
+    url = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + timeout_sec
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"app.py exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/config", timeout=2).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+
+    proc.terminate()
+    raise TimeoutError(f"app.py did not start within {timeout_sec} s")
+
+
+class GradioSession:
+    """
+    One simulated browser tab.
+    Select events need event data (the click coordinates), which gradio_client
+    cannot send, so those go through the queue HTTP API directly; generation
+    requests use gradio_client.
+    """
+
+    def __init__(self, url: str, dependencies: dict, map_file: dict):
+        self.url = url
+        self.dependencies = dependencies
+        self.map_file = map_file
+        self.http = httpx.Client(timeout=None)
+        self.client = Client(url, verbose=False)
+        self.session_hash = uuid.uuid4().hex[:11]
+
+    def trigger(self, calls: list) -> list:
+        """
+        Submit several events at once, like the browser does when one user action
+        has several listeners, and wait for all of them on a single event stream.
+        `calls` is a list of (api_name, data, event_data); returns one
+        (output data or exception, latency in seconds) pair per call.
+        """
+        start = time.perf_counter()
+        event_ids = []
+        for api_name, data, event_data in calls:
+            dep = self.dependencies[api_name]
+            resp = self.http.post(f"{self.url}/gradio_api/queue/join", json={
+                "data": data,
+                "event_data": event_data,
+                "fn_index": dep["id"],
+                "trigger_id": dep["targets"][0][0] if dep.get("targets") else None,
+                "session_hash": self.session_hash,
+            })
+            resp.raise_for_status()
+            event_ids.append(resp.json()["event_id"])
+
+        results = {}
+        with self.http.stream("GET", f"{self.url}/gradio_api/queue/data",
+                              params={"session_hash": self.session_hash}) as stream:
+            for line in stream.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                msg = json.loads(line[5:])
+                event_id = msg.get("event_id")
+                if msg.get("msg") == "process_completed" and event_id in event_ids:
+                    if msg.get("success"):
+                        outcome = msg["output"]["data"]
+                    else:
+                        outcome = RuntimeError(msg.get("output", {}).get("error") or "process failed")
+                    results[event_id] = (outcome, time.perf_counter() - start)
+                elif msg.get("msg") in ("unexpected_error", "close_stream"):
+                    break
+                if len(results) == len(event_ids):
+                    break
+
+        missing = (RuntimeError("event stream ended without a result"), time.perf_counter() - start)
+        return [results.get(e, missing) for e in event_ids]
+
+    def click(self, x: int, y: int) -> dict:
+        """
+        One click on the static map: both select listeners fire concurrently.
+        """
+        event_data = {"index": [x, y], "value": None, "selected": True}
+        outcomes = self.trigger([
+            ("handle_click", [], event_data),
+            ("draw_markers_on_image", [self.map_file], event_data),
+        ])
+        return dict(zip(("handle_click", "draw_markers_on_image"), outcomes))
+
+    def generate(self, monument_name: str):
+        return self.client.predict(monument_name, api_name="/process_monument_ui")
+
+    def close(self):
+        self.http.close()
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, op: str, latency_sec: float, error: Exception = None):
+        with self.lock:
+            self.latencies.setdefault(op, []).append(latency_sec)
+            if error is not None:
+                self.errors.setdefault(op, []).append(str(error))
+
+    def timed(self, op: str, fn, *args):
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self.record(op, time.perf_counter() - start, e)
+            return None
+        self.record(op, time.perf_counter() - start)
+        return result
+
+    def report(self, wall_sec: float) -> dict:
+        rows = {}
+        for op, lat in self.latencies.items():
+            lat_ms = np.array(lat) * 1000
+            errors = len(self.errors.get(op, []))
+            rows[op] = {
+                "requests": len(lat),
+                "errors": errors,
+                "error_rate": errors / len(lat),
+                "throughput_rps": len(lat) / wall_sec,
+                "p50_ms": float(np.percentile(lat_ms, 50)),
+                "p95_ms": float(np.percentile(lat_ms, 95)),
+                "p99_ms": float(np.percentile(lat_ms, 99)),
+            }
+
+        print(f"\n{'operation':<24}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for op, r in rows.items():
+            print(f"{op:<24}{r['requests']:>10}{r['errors']:>8}{r['throughput_rps']:>9.2f}"
+                  f"{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}{r['p99_ms']:>10.0f}")
+        for op, errs in self.errors.items():
+            print(f"⚠️ {op}: {len(errs)} errors, first: {errs[0]}")
+        print(f"Wall time: {wall_sec:.1f} s")
+        print("Note: the monument dropdown has no server-side listener in app.py, so selection "
+              "is not sent as a request (it only chooses the 'generate' input).")
+        return rows
+
+
+def run_user(url, dependencies, map_file, map_size, monuments, stats, args, seed):
+    rng = random.Random(seed)
+    session = GradioSession(url, dependencies, map_file)
+    w, h = map_size
+    try:
+        for _ in range(args.iterations):
+            x, y = rng.randrange(w), rng.randrange(h)
+            start = time.perf_counter()
+            try:
+                outcomes = session.click(x, y)
+            except Exception as e:
+                stats.record("click", time.perf_counter() - start, e)
+                continue
+            for op, (outcome, latency) in outcomes.items():
+                stats.record(op, latency, outcome if isinstance(outcome, Exception) else None)
+            failed = [o for o, _ in outcomes.values() if isinstance(o, Exception)]
+            stats.record("click", max(latency for _, latency in outcomes.values()), failed[0] if failed else None)
+
+            # Dropdown selection happens client-side only (no listener in app.py):
+            # pick one of the nearby monuments, else any monument, and generate for it.
+            result = outcomes["handle_click"][0]
+            choices = (result[1] or {}).get("choices") if not isinstance(result, Exception) else None
+            names = [c[0] if isinstance(c, (list, tuple)) else c for c in choices or []]
+            name = rng.choice(names or monuments)
+
+            if rng.random() < args.generate_ratio:
+                stats.timed("generate", session.generate, name)
+
+            if args.think_time:
+                time.sleep(rng.uniform(0, args.think_time))
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-user load test for app.py")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=5, help="click/generate rounds per user")
+    parser.add_argument("--generate-ratio", type=float, default=0.5, help="probability a round requests music")
+    parser.add_argument("--think-time", type=float, default=0.0, help="max random pause between rounds (s)")
+    parser.add_argument("--port", type=int, default=7870, help="port for the app started by the harness")
+    parser.add_argument("--url", help="test an already running app instead of starting one")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = start_app(args.port)
+
+    try:
+        config = httpx.get(f"{url}/config", timeout=10).json()
+        dependencies = {d["api_name"]: d for d in config["dependencies"] if d.get("api_name")}
+
+        with open(MAP_IMAGE, "rb") as f:
+            uploaded = httpx.post(f"{url}/gradio_api/upload", files={"files": f}, timeout=30).json()
+        map_file = {"path": uploaded[0], "orig_name": os.path.basename(MAP_IMAGE), "meta": {"_type": "gradio.FileData"}}
+        with Image.open(MAP_IMAGE) as img:
+            map_size = img.size
+
+        monuments = [m["nume"] for m in load_monuments()]
+        stats = Stats()
+
+        print(f"🚀 {args.users} users x {args.iterations} rounds against {url}")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            futures = [pool.submit(run_user, url, dependencies, map_file, map_size, monuments, stats, args, i)
+                       for i in range(args.users)]
+            for f in futures:
+                f.result()
+        rows = stats.report(time.perf_counter() - start)
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"users": args.users, "iterations": args.iterations, "results": rows}, f, indent=2)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 from PIL import Image
-from transformers import pipeline
 from datasets.monuments import match_monument_by_name
+from modules import model_registry
 
-captioner = pipeline("image-to-text", model="Salesforce/blip-image-captioning-base")
+captioner_id = "Salesforce/blip-image-captioning-base"
 
 def generate_caption(image_path: str):
-    base_caption = captioner(Image.open(image_path))[0]["generated_text"]
+    with model_registry.use(captioner_id, model_registry.pipeline_loader("image-to-text")) as captioner:
+        base_caption = captioner(Image.open(image_path))[0]["generated_text"]
     matched = match_monument_by_name(base_caption)
 
     if matched:
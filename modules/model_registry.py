@@ -0,0 +1,264 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+import gc
+import os
+import threading
+import time
+import torch
+
+# ------------------- Shared Model Registry -------------------
+
+# One shared instance per (model id, dtype), loaded on first use.
+# Idle models are unloaded (least recently used first) when the budget is exceeded
+# or when they have not been used for MODEL_IDLE_TIMEOUT_SEC.
+MODEL_RAM_BUDGET_BYTES = int(float(os.environ.get("MODEL_RAM_BUDGET_GB", "12")) * 1024 ** 3)
+MODEL_IDLE_TIMEOUT_SEC = float(os.environ.get("MODEL_IDLE_TIMEOUT_SEC", "1800"))
+
+device = "cuda" if torch.cuda.is_available() else "cpu"
+
+_models = OrderedDict()
+_loading = {}
+_reserved = {}
+_known_bytes = {}
+_lock = threading.RLock()
+_reaper = None
+
+
+def _key(model_id: str, dtype=None):
+    return (model_id, str(dtype) if dtype is not None else "default")
+
+
+def resident_bytes(obj) -> int:
+    """
+    Bytes held by the parameters and buffers of the torch modules inside `obj`.
+    Understands plain modules, pipelines (`.model`) and tuples of those.
+    """
+    if isinstance(obj, (tuple, list)):
+        return sum(resident_bytes(o) for o in obj)
+    if not isinstance(obj, torch.nn.Module):
+        obj = getattr(obj, "model", None)
+        if not isinstance(obj, torch.nn.Module):
+            return 0
+    tensors = list(obj.parameters()) + list(obj.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def total_bytes() -> int:
+    with _lock:
+        return sum(e["bytes"] for e in _models.values())
+
+
+def _unload(key):
+    entry = _models.pop(key)
+    print(f"♻️ Unloading {key[0]} ({key[1]}), {entry['bytes'] / 1024 ** 2:.0f} MB")
+    del entry
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+_DTYPE_BYTES = {"F64": 8, "I64": 8, "F32": 4, "I32": 4, "F16": 2, "BF16": 2, "I16": 2, "I8": 1, "U8": 1, "BOOL": 1}
+
+
+def estimate_bytes(model_id: str, dtype=None) -> int:
+    """
+    Expected resident size before loading: the size recorded by an earlier load,
+    else the parameter count from the checkpoint's safetensors metadata, else 0.
+    """
+    key = _key(model_id, dtype)
+    with _lock:
+        if key in _known_bytes:
+            return _known_bytes[key]
+
+    try:
+        from huggingface_hub import get_safetensors_metadata
+        counts = get_safetensors_metadata(model_id).parameter_count
+    except Exception as e:
+        print(f"⚠️ No size metadata for {model_id}: {e}")
+        return 0
+
+    if dtype is not None:
+        element_size = torch.empty(0, dtype=dtype).element_size()
+        return sum(counts.values()) * element_size
+    return sum(n * _DTYPE_BYTES.get(t, 4) for t, n in counts.items())
+
+
+def _enforce_budget(keep=None):
+    """
+    Unload idle models, least recently used first, until the loaded models plus
+    the sizes reserved for in-flight loads fit in the budget.
+    """
+    def used():
+        return total_bytes() + sum(_reserved.values())
+
+    for key in list(_models):
+        if used() <= MODEL_RAM_BUDGET_BYTES:
+            break
+        if key != keep and _models[key]["in_use"] == 0:
+            _unload(key)
+
+    if used() > MODEL_RAM_BUDGET_BYTES:
+        print(f"⚠️ Models use {used() / 1024 ** 3:.1f} GB, over the "
+              f"{MODEL_RAM_BUDGET_BYTES / 1024 ** 3:.1f} GB budget (remaining models are in use)")
+
+
+def unload_idle(timeout_sec: float = None):
+    """
+    Unload every model that is not in use and has been idle for longer than `timeout_sec`.
+    """
+    timeout_sec = MODEL_IDLE_TIMEOUT_SEC if timeout_sec is None else timeout_sec
+    now = time.monotonic()
+    with _lock:
+        for key in list(_models):
+            entry = _models[key]
+            if entry["in_use"] == 0 and now - entry["last_used"] > timeout_sec:
+                _unload(key)
+
+
+def _reap_forever():
+    while True:
+        time.sleep(max(1.0, MODEL_IDLE_TIMEOUT_SEC / 4))
+        unload_idle()
+
+
+def _start_reaper():
+    global _reaper
+    if _reaper is None:
+        _reaper = threading.Thread(target=_reap_forever, name="model-registry-reaper", daemon=True)
+        _reaper.start()
+
+
+def get(model_id: str, loader, dtype=None):
+    """
+    Return the shared instance for (model_id, dtype), calling `loader(model_id, dtype)` on first use.
+    Loading happens outside the registry lock; concurrent callers for the same key wait for it.
+    """
+    key = _key(model_id, dtype)
+    while True:
+        with _lock:
+            entry = _models.get(key)
+            if entry is not None:
+                _models.move_to_end(key)
+                entry["last_used"] = time.monotonic()
+                return entry["obj"]
+            pending = _loading.get(key)
+            owner = pending is None
+            if owner:
+                pending = _loading[key] = Future()
+        if owner:
+            break
+        # Another thread is loading this model; re-check once it is done (raises its error).
+        pending.result()
+
+    try:
+        # Make room before the new weights become resident, not after.
+        estimate = estimate_bytes(model_id, dtype)
+        with _lock:
+            _reserved[key] = estimate
+            _enforce_budget()
+        print(f"📦 Loading {model_id} ({key[1]}), ~{estimate / 1024 ** 2:.0f} MB")
+        obj = loader(model_id, dtype)
+    except BaseException as e:
+        with _lock:
+            _reserved.pop(key, None)
+            del _loading[key]
+        pending.set_exception(e)
+        raise
+
+    with _lock:
+        entry = {"obj": obj, "bytes": resident_bytes(obj), "in_use": 0, "last_used": time.monotonic()}
+        _models[key] = entry
+        _known_bytes[key] = entry["bytes"]
+        del _reserved[key]
+        del _loading[key]
+        _enforce_budget(keep=key)
+        _start_reaper()
+    pending.set_result(None)
+    return obj
+
+
+@contextmanager
+def use(model_id: str, loader, dtype=None):
+    """
+    Like `get`, but keeps the model pinned (never unloaded) while the block runs.
+    """
+    key = _key(model_id, dtype)
+    while True:
+        obj = get(model_id, loader, dtype)
+        with _lock:
+            entry = _models.get(key)
+            # It may have been unloaded between get() and here; load it again then.
+            if entry is not None and entry["obj"] is obj:
+                entry["in_use"] += 1
+                break
+    try:
+        yield obj
+    finally:
+        with _lock:
+            entry = _models.get(key)
+            if entry is not None:
+                entry["in_use"] -= 1
+                entry["last_used"] = time.monotonic()
+
+
+def report():
+    """
+    Resident memory of every loaded model, most recently used last.
+    """
+    now = time.monotonic()
+    with _lock:
+        rows = [{
+            "model_id": key[0],
+            "dtype": key[1],
+            "bytes": entry["bytes"],
+            "in_use": entry["in_use"],
+            "idle_sec": round(now - entry["last_used"], 1),
+        } for key, entry in _models.items()]
+
+    for r in rows:
+        print(f"  {r['model_id']} ({r['dtype']}): {r['bytes'] / 1024 ** 2:.0f} MB, "
+              f"in use: {r['in_use']}, idle: {r['idle_sec']} s")
+    print(f"  total: {sum(r['bytes'] for r in rows) / 1024 ** 2:.0f} MB / "
+          f"{MODEL_RAM_BUDGET_BYTES / 1024 ** 2:.0f} MB budget")
+    return rows
+
+# ------------------- Loaders -------------------
+
+def load_musicgen(model_id: str, dtype=None):
+    """
+    Loader returning (processor, model) for a MusicGen checkpoint.
+    """
+    from transformers import MusicgenForConditionalGeneration, MusicgenProcessor
+
+    processor = MusicgenProcessor.from_pretrained(model_id)
+    kwargs = {"torch_dtype": dtype} if dtype is not None else {}
+    model = MusicgenForConditionalGeneration.from_pretrained(model_id, **kwargs)
+    model.to(device)
+    return processor, model
+
+
+def load_text_embedder(model_id: str, dtype=None):
+    """
+    Loader returning (tokenizer, model) for a sentence embedding checkpoint.
+    """
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    kwargs = {"torch_dtype": dtype} if dtype is not None else {}
+    model = AutoModel.from_pretrained(model_id, **kwargs)
+    model.eval()
+    return tokenizer, model
+
+
+def pipeline_loader(task: str):
+    """
+    Loader factory for a transformers pipeline of the given task.
+    """
+    def load(model_id: str, dtype=None):
+        from transformers import pipeline
+
+        kwargs = {"torch_dtype": dtype} if dtype is not None else {}
+        return pipeline(task, model=model_id, **kwargs)
+
+    return load
@@ -1,8 +1,13 @@
-from transformers import MusicgenForConditionalGeneration, MusicgenProcessor
+from collections import OrderedDict
+from datasets.monuments import load_monuments
+from modules import model_registry, semantic_cache
 import torch
 import scipy.io.wavfile
+import numpy as np
+import math
 import os
 import re
+import threading
 
 # ------------------- Smart Style Inference -------------------
 
@@ -113,12 +118,54 @@ def infer_monument_style(description: str) -> str:
     return ", ".join(detected)
 
 
+# ------------------- Token Budget Planner -------------------
+
+# MusicGen was trained on 30 s clips; longer tracks are built from segments
+# that continue from the last CONTINUATION_CONTEXT_SEC of the previous one.
+MAX_SEGMENT_SEC = 30
+CONTINUATION_CONTEXT_SEC = 10
+
+def plan_generation(duration_sec: float, frame_rate: int, num_codebooks: int,
+                    max_segment_sec: float = MAX_SEGMENT_SEC,
+                    context_sec: float = CONTINUATION_CONTEXT_SEC):
+    """
+    Plans the codec frames needed for `duration_sec` of audio.
+    Returns a list of segments, each a dict with:
+      - context_frames: tail codes of the previous segment used as the prompt
+      - new_frames: frames this segment adds to the track
+      - max_new_tokens: decoder steps needed to produce them
+    The new_frames of all segments add up to exactly ceil(duration_sec * frame_rate).
+    """
+    total_frames = max(1, math.ceil(duration_sec * frame_rate))
+    max_frames = int(max_segment_sec * frame_rate)
+    context_frames = int(context_sec * frame_rate)
+    if context_frames >= max_frames:
+        raise ValueError("context_sec must be shorter than max_segment_sec")
+
+    plan = []
+    done = 0
+    while done < total_frames:
+        context = min(context_frames, done)
+        new = min(total_frames - done, max_frames - context)
+        plan.append({
+            "context_frames": context,
+            "new_frames": new,
+            # The delay pattern keeps the last (num_codebooks - 1) steps incomplete,
+            # so that many extra steps are needed to close the final frame.
+            "max_new_tokens": new + num_codebooks - 1,
+        })
+        done += new
+    return plan
+
+
 model_id = "facebook/musicgen-medium"
-processor = MusicgenProcessor.from_pretrained(model_id)
-model = MusicgenForConditionalGeneration.from_pretrained(model_id)
+device = model_registry.device
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model.to(device)
+def _musicgen():
+    """
+    Shared (processor, model) pair, loaded lazily by the model registry.
+    """
+    return model_registry.get(model_id, model_registry.load_musicgen)
 
 try:
     from deep_translator import GoogleTranslator
@@ -138,9 +185,9 @@ def normalize_ro(text: str) -> str:
     pattern = re.compile("|".join(re.escape(k) for k in replacements.keys()))
     return pattern.sub(lambda m: replacements[m.group(0)], text)
 
-def generate_music(caption: str, style: str = "", output_path="generated.wav", duration_sec: int = 15):
+def build_prompt(caption: str, style: str = "") -> str:
     """
-    Generate music from a text caption using MusicGen.
+    Build the final MusicGen prompt from a (Romanian) caption.
     """
     caption_norm = normalize_ro(caption)
 
@@ -168,6 +215,35 @@ def generate_music(caption: str, style: str = "", output_path="generated.wav", d
         prompt = "Cinematic music."
         print("Prompt was empty, using fallback:", prompt)
 
+    return prompt
+
+# ------------------- Text Encoder Cache -------------------
+
+# LRU cache of T5 encoder outputs keyed by (model_id, prompt), bounded in bytes.
+TEXT_ENCODER_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_text_encoder_cache = OrderedDict()
+_text_encoder_cache_bytes = 0
+_text_encoder_cache_lock = threading.Lock()
+
+def _entry_bytes(entry: dict) -> int:
+    return sum(t.numel() * t.element_size() for t in entry.values())
+
+def encode_prompt(prompt: str) -> dict:
+    """
+    Tokenize and run the text encoder for a prompt, reusing cached outputs.
+    Returns a dict with input_ids, attention_mask and last_hidden_state.
+    """
+    global _text_encoder_cache_bytes
+    key = (model_id, prompt)
+
+    with _text_encoder_cache_lock:
+        entry = _text_encoder_cache.get(key)
+        if entry is not None:
+            _text_encoder_cache.move_to_end(key)
+            return entry
+
+    processor, model = _musicgen()
     tokens = processor.tokenizer(prompt, return_tensors="pt")
 
     print("Tokens input_ids shape:", tokens.input_ids.shape)
@@ -182,38 +258,129 @@ def generate_music(caption: str, style: str = "", output_path="generated.wav", d
     if tokens.input_ids.shape[1] == 0:
         raise ValueError("Tokenizer failed to produce any tokens. Please use a non-empty prompt.")
 
-    tokens = {k: v.to(device) for k, v in tokens.items()}
+    input_ids = tokens.input_ids.to(device)
+    attention_mask = tokens.attention_mask.to(device)
+    with torch.no_grad():
+        last_hidden_state = model.text_encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
 
-    frame_rate = getattr(model.config.audio_encoder, "frame_rate", None)
-    if frame_rate is None or frame_rate == 0:
-        print("⚠️ frame_rate not set in config, using default 16000")
-        frame_rate = 16000
+    entry = {"input_ids": input_ids, "attention_mask": attention_mask, "last_hidden_state": last_hidden_state}
+    size = _entry_bytes(entry)
 
-    max_length = max(1, int(duration_sec * frame_rate / 1024))
-    print("valori ", duration_sec, frame_rate)
-    print("Max length for generation:", max_length)
-    import numpy as np
-    chunk_max_length = 100 
-    num_chunks = max(1, int(np.ceil(duration_sec / 5)))
-    print("Num chunks:", num_chunks)
+    with _text_encoder_cache_lock:
+        if key not in _text_encoder_cache and size <= TEXT_ENCODER_CACHE_MAX_BYTES:
+            _text_encoder_cache[key] = entry
+            _text_encoder_cache_bytes += size
+            while _text_encoder_cache_bytes > TEXT_ENCODER_CACHE_MAX_BYTES:
+                _, evicted = _text_encoder_cache.popitem(last=False)
+                _text_encoder_cache_bytes -= _entry_bytes(evicted)
 
-    all_audio = []
+    return entry
 
-    for i in range(num_chunks):
-        print(f"🎵 Generating chunk {i+1}/{num_chunks}...")
-        audio_chunk = model.generate(**tokens, max_length=chunk_max_length)
+def conditioning_kwargs(entry: dict) -> dict:
+    """
+    Turn a cached encoding into `model.decoder.generate` kwargs (cross-attention inputs).
+    Mirrors what MusicGen does internally: projection to the decoder width, masking,
+    and the null input for classifier-free guidance.
+    """
+    last_hidden_state = entry["last_hidden_state"]
+    attention_mask = entry["attention_mask"]
+
+    _, model = _musicgen()
+    with torch.no_grad():
+        if (model.text_encoder.config.hidden_size != model.decoder.config.hidden_size
+                and model.decoder.config.cross_attention_hidden_size is None):
+            last_hidden_state = model.enc_to_dec_proj(last_hidden_state)
+        last_hidden_state = last_hidden_state * attention_mask[..., None]
+
+    guidance_scale = model.generation_config.guidance_scale
+    if guidance_scale is not None and guidance_scale > 1:
+        last_hidden_state = torch.cat([last_hidden_state, torch.zeros_like(last_hidden_state)], dim=0)
+        attention_mask = torch.cat([attention_mask, torch.zeros_like(attention_mask)], dim=0)
+
+    return {
+        "encoder_hidden_states": last_hidden_state,
+        "encoder_attention_mask": attention_mask,
+    }
 
-        if hasattr(audio_chunk, "cpu"):
-            audio_chunk = audio_chunk.cpu().numpy()
+def warm_up_prompt_cache(monuments=None):
+    """
+    Precompute text encodings for every monument prompt.
+    """
+    if monuments is None:
+        monuments = load_monuments()
 
-        all_audio.append(audio_chunk.reshape(-1))
+    with model_registry.use(model_id, model_registry.load_musicgen):
+        for m in monuments:
+            caption = m.get("descriere") or ""
+            encode_prompt(build_prompt(caption))
 
-    final_audio = np.concatenate(all_audio)
+    print(f"✅ Prompt cache warmed up: {len(_text_encoder_cache)} prompts, {_text_encoder_cache_bytes / 1e6:.1f} MB")
 
-    target_len = int(16000 * duration_sec)
-    final_audio = final_audio[:target_len]
+def generate_audio(prompt: str, duration_sec: float = 15):
+    """
+    Run MusicGen on a final prompt for exactly `duration_sec` seconds.
+    Returns (float32 audio, sampling_rate).
+    """
+    with model_registry.use(model_id, model_registry.load_musicgen) as (_, model):
+        conditioning = conditioning_kwargs(encode_prompt(prompt))
+
+        frame_rate = model.config.audio_encoder.frame_rate
+        sampling_rate = model.config.audio_encoder.sampling_rate
+        num_codebooks = model.decoder.num_codebooks
+        start_token_id = model.generation_config.decoder_start_token_id
+
+        plan = plan_generation(duration_sec, frame_rate, num_codebooks)
+        print(f"Generation plan: {sum(s['new_frames'] for s in plan)} frames in {len(plan)} segment(s)")
+
+        # Codes produced by the LM so far, (num_codebooks, frames). Each segment is
+        # prompted with the tail of these codes and only its new frames are appended.
+        codes = torch.zeros((num_codebooks, 0), dtype=torch.long, device=device)
+
+        for i, segment in enumerate(plan):
+            print(f"🎵 Generating segment {i+1}/{len(plan)}: {segment}")
+            context = codes[:, codes.shape[1] - segment["context_frames"]:]
+            start = torch.full((num_codebooks, 1), start_token_id, dtype=torch.long, device=device)
+            input_ids = torch.cat([start, context], dim=-1)
+
+            # The decoder alone returns codes (delay pattern already reverted), unlike
+            # model.generate, which decodes to audio.
+            output_ids = model.decoder.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                generation_config=model.generation_config,
+                max_new_tokens=segment["max_new_tokens"],
+                **conditioning,
+            )
+            codes = torch.cat([codes, output_ids[0, :, segment["context_frames"]:]], dim=-1)
+
+        # Decode the whole code sequence once.
+        with torch.no_grad():
+            audio_values = model.audio_encoder.decode(codes[None, None], audio_scales=[None]).audio_values
+
+    return audio_values[0, 0].cpu().numpy().astype(np.float32)[:int(sampling_rate * duration_sec)], sampling_rate
+
+
+def generate_music(caption: str, style: str = "", output_path="generated.wav", duration_sec: int = 15, monument: str = None):
+    """
+    Generate music from a text caption using MusicGen.
+    With the semantic cache enabled, a near-identical earlier prompt returns its track instead.
+    """
+    prompt = build_prompt(caption, style)
 
-    scipy.io.wavfile.write(output_path, 16000, final_audio.astype(np.float32))
+    vector = None
+    if semantic_cache.is_enabled(monument):
+        vector = semantic_cache.embed(prompt)
+        cached_path = semantic_cache.lookup(prompt, duration_sec, monument, vector=vector)
+        print("Semantic cache:", semantic_cache.stats())
+        if cached_path:
+            return cached_path
+
+    final_audio, sampling_rate = generate_audio(prompt, duration_sec)
+
+    scipy.io.wavfile.write(output_path, sampling_rate, final_audio)
     print(f"✅ Music generated: {output_path}")
 
-    return output_path
\ No newline at end of file
+    if vector is not None:
+        semantic_cache.add(prompt, duration_sec, output_path, monument, vector=vector)
+
+    return output_path
@@ -0,0 +1,141 @@
+from modules import model_registry
+import numpy as np
+import hashlib
+import json
+import os
+import shutil
+import threading
+import torch
+
+# ------------------- Semantic Music Cache -------------------
+
+# Opt-in: reuse an already generated track when a new prompt is close enough
+# to a previous one (e.g. two churches with nearly identical descriptions).
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_MUSIC_CACHE") == "1"
+SIMILARITY_THRESHOLD = float(os.environ.get("SEMANTIC_MUSIC_CACHE_THRESHOLD", "0.92"))
+
+CACHE_DIR = "assets/music_cache"
+INDEX_PATH = os.path.join(CACHE_DIR, "index.json")
+
+embedder_id = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Per-monument overrides, e.g. {"Castelul Bran": {"enabled": False}, "Salina Turda": {"threshold": 0.97}}
+MONUMENT_OVERRIDES = {}
+
+_entries = None
+_embeddings = None
+_stats = {"hits": 0, "misses": 0}
+_lock = threading.Lock()
+
+
+def embed(text: str) -> np.ndarray:
+    """
+    L2-normalized mean-pooled sentence embedding of `text`.
+    """
+    with model_registry.use(embedder_id, model_registry.load_text_embedder) as (tokenizer, model):
+        tokens = tokenizer(text, truncation=True, return_tensors="pt")
+        with torch.no_grad():
+            hidden = model(**tokens).last_hidden_state
+    mask = tokens["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+    vector = ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1))[0].float().numpy()
+    return vector / max(np.linalg.norm(vector), 1e-12)
+
+
+def _load_index():
+    global _entries, _embeddings
+    if _entries is not None:
+        return
+
+    _entries, vectors = [], []
+    if os.path.exists(INDEX_PATH):
+        with open(INDEX_PATH, encoding="utf-8") as f:
+            for e in json.load(f):
+                if os.path.exists(e["path"]):
+                    vectors.append(e.pop("embedding"))
+                    _entries.append(e)
+    # (tracks, dim) matrix, or None while the index is empty
+    _embeddings = np.array(vectors, dtype=np.float32) if vectors else None
+
+
+def _save_index():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    data = [dict(e, embedding=v.tolist()) for e, v in zip(_entries, _embeddings)]
+    tmp_path = INDEX_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, INDEX_PATH)
+
+
+def _settings(monument: str = None):
+    override = MONUMENT_OVERRIDES.get(monument, {}) if monument else {}
+    return override.get("enabled", SEMANTIC_CACHE_ENABLED), override.get("threshold", SIMILARITY_THRESHOLD)
+
+
+def is_enabled(monument: str = None) -> bool:
+    return _settings(monument)[0]
+
+
+def lookup(prompt: str, duration_sec: float, monument: str = None, vector: np.ndarray = None):
+    """
+    Path of the closest cached track with the same duration if its similarity
+    reaches the threshold, else None.
+    """
+    enabled, threshold = _settings(monument)
+    if not enabled:
+        return None
+
+    vector = embed(prompt) if vector is None else vector
+    with _lock:
+        _load_index()
+        best, best_sim = None, -1.0
+        if _entries:
+            sims = _embeddings @ vector
+            for i in np.argsort(-sims):
+                if _entries[i]["duration_sec"] == duration_sec:
+                    best, best_sim = _entries[i], float(sims[i])
+                    break
+
+        if best is not None and best_sim >= threshold:
+            _stats["hits"] += 1
+            print(f"♻️ Semantic cache hit ({best_sim:.3f}): reusing track of '{best.get('monument') or best['prompt'][:60]}'")
+            return best["path"]
+
+        _stats["misses"] += 1
+        return None
+
+
+def add(prompt: str, duration_sec: float, track_path: str, monument: str = None, vector: np.ndarray = None) -> str:
+    """
+    Copy a generated track into the cache and index it. Returns the cached path.
+    """
+    global _embeddings
+    vector = embed(prompt) if vector is None else vector
+    digest = hashlib.sha1(f"{prompt}|{duration_sec}".encode("utf-8")).hexdigest()[:16]
+    cached_path = os.path.join(CACHE_DIR, f"{digest}.wav")
+
+    with _lock:
+        _load_index()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        shutil.copyfile(track_path, cached_path)
+
+        if not any(e["path"] == cached_path for e in _entries):
+            _entries.append({"prompt": prompt, "monument": monument, "duration_sec": duration_sec, "path": cached_path})
+            row = vector[None].astype(np.float32)
+            _embeddings = row if _embeddings is None else np.vstack([_embeddings, row])
+            _save_index()
+
+    return cached_path
+
+
+def stats() -> dict:
+    """
+    Hit/miss counters of the semantic cache.
+    """
+    with _lock:
+        total = _stats["hits"] + _stats["misses"]
+        return {
+            "hits": _stats["hits"],
+            "misses": _stats["misses"],
+            "hit_rate": _stats["hits"] / total if total else 0.0,
+            "tracks": len(_entries) if _entries is not None else 0,
+        }
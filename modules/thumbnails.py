@@ -0,0 +1,119 @@
+from PIL import Image, features
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import tempfile
+import threading
+
+# ------------------- Image Derivatives -------------------
+
+THUMBNAILS_DIR = "assets/thumbnails"
+
+# Longest side in pixels for each variant (2x the largest size it is displayed at).
+VARIANT_SIZES = {
+    "thumb": 240,
+    "card": 720,
+    "full": 1600,
+}
+
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+DEFAULT_FORMAT = "webp" if features.check("webp") else "jpeg"
+
+_hash_cache = {}
+_hash_lock = threading.Lock()
+
+def source_hash(image_path: str) -> str:
+    """
+    Content hash of a source image, memoized by (path, size, mtime).
+    """
+    stat = os.stat(image_path)
+    key = (image_path, stat.st_size, stat.st_mtime_ns)
+
+    with _hash_lock:
+        digest = _hash_cache.get(key)
+    if digest is not None:
+        return digest
+
+    with open(image_path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:16]
+
+    with _hash_lock:
+        _hash_cache[key] = digest
+    return digest
+
+def variant_path(image_path: str, variant: str = "card", fmt: str = DEFAULT_FORMAT) -> str:
+    ext = "jpg" if fmt == "jpeg" else fmt
+    return os.path.join(THUMBNAILS_DIR, f"{source_hash(image_path)}_{variant}.{ext}")
+
+def _render_variants(image_path: str, fmt: str) -> dict:
+    """
+    Write every missing variant of one source image and return {variant: path}.
+    """
+    paths = {v: variant_path(image_path, v, fmt) for v in VARIANT_SIZES}
+    missing = [v for v, p in paths.items() if not os.path.exists(p)]
+    if not missing:
+        return paths
+
+    pil_format, save_kwargs = FORMATS[fmt]
+    os.makedirs(THUMBNAILS_DIR, exist_ok=True)
+
+    with Image.open(image_path) as src:
+        src = src.convert("RGB")
+        # Largest first, so smaller variants are resized from an already reduced image.
+        for v in sorted(missing, key=VARIANT_SIZES.get, reverse=True):
+            size = VARIANT_SIZES[v]
+            img = src.copy()
+            img.thumbnail((size, size), Image.LANCZOS)
+            # Unique temp name: several workers may render the same hash at once.
+            tmp = tempfile.NamedTemporaryFile(dir=THUMBNAILS_DIR, suffix=".tmp", delete=False)
+            try:
+                with tmp:
+                    img.save(tmp, pil_format, **save_kwargs)
+                os.replace(tmp.name, paths[v])
+            except BaseException:
+                if os.path.exists(tmp.name):
+                    os.unlink(tmp.name)
+                raise
+            src = img
+
+    return paths
+
+def get_variant(image_path: str, variant: str = "card", fmt: str = DEFAULT_FORMAT) -> str:
+    """
+    Path of the requested variant, generated on first use.
+    Falls back to the original image if it can't be read.
+    """
+    if variant not in VARIANT_SIZES:
+        raise ValueError(f"Unknown variant '{variant}', expected one of {list(VARIANT_SIZES)}")
+    if not image_path or not os.path.exists(image_path):
+        return image_path
+
+    try:
+        return _render_variants(image_path, fmt)[variant]
+    except OSError as e:
+        print(f"⚠️ Thumbnail generation failed for {image_path}: {e}")
+        return image_path
+
+def build_all(image_paths, fmt: str = DEFAULT_FORMAT, workers: int = None) -> dict:
+    """
+    Generate all variants for many images in parallel.
+    Returns {image_path: {variant: path}} for the images that exist.
+    """
+    image_paths = [p for p in dict.fromkeys(image_paths) if p and os.path.exists(p)]
+    workers = workers or min(8, os.cpu_count() or 1)
+
+    def render(path):
+        try:
+            return path, _render_variants(path, fmt)
+        except OSError as e:
+            print(f"⚠️ Thumbnail generation failed for {path}: {e}")
+            return path, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = dict(pool.map(render, image_paths))
+
+    return {p: v for p, v in results.items() if v}
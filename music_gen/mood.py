@@ -1,6 +1,6 @@
-from transformers import pipeline
+from modules import model_registry
 
-mood_model = pipeline("text2text-generation", model="google/flan-t5-base")
+mood_model_id = "google/flan-t5-base"
 
 def extract_music_mood(caption: str) -> str:
     """
@@ -14,5 +14,6 @@ def extract_music_mood(caption: str) -> str:
         "Output in 15 words or less.\n\n"
         f"Image description: {caption}\n\nMusic prompt:"
     )
-    result = mood_model(prompt)[0]["generated_text"]
+    with model_registry.use(mood_model_id, model_registry.pipeline_loader("text2text-generation")) as mood_model:
+        result = mood_model(prompt)[0]["generated_text"]
     return result.strip()
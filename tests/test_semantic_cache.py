@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip("torch")
+
+import numpy as np
+
+from modules import semantic_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(semantic_cache, "CACHE_DIR", str(tmp_path / "music_cache"))
+    monkeypatch.setattr(semantic_cache, "INDEX_PATH", str(tmp_path / "music_cache" / "index.json"))
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(semantic_cache, "_entries", None)
+    monkeypatch.setattr(semantic_cache, "_embeddings", None)
+    monkeypatch.setattr(semantic_cache, "_stats", {"hits": 0, "misses": 0})
+
+    vectors = {
+        "church": np.array([1.0, 0.0, 0.0], dtype=np.float32),
+        "church bells": np.array([0.99, 0.14, 0.0], dtype=np.float32),
+        "fortress": np.array([0.0, 1.0, 0.0], dtype=np.float32),
+    }
+    monkeypatch.setattr(semantic_cache, "embed", lambda text: vectors[text] / np.linalg.norm(vectors[text]))
+    return semantic_cache
+
+
+def test_lookup_then_add_on_empty_cache(cache, tmp_path):
+    track = tmp_path / "track.wav"
+    track.write_bytes(b"RIFF")
+
+    assert cache.lookup("church", 15) is None
+    cached_path = cache.add("church", 15, str(track))
+
+    assert cache.lookup("church bells", 15) == cached_path
+    assert cache.lookup("fortress", 15) is None
+    assert cache.lookup("church", 30) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 3
+
+
+def test_index_is_reloaded_from_disk(cache, tmp_path, monkeypatch):
+    track = tmp_path / "track.wav"
+    track.write_bytes(b"RIFF")
+    cached_path = cache.add("church", 15, str(track))
+
+    monkeypatch.setattr(cache, "_entries", None)
+    monkeypatch.setattr(cache, "_embeddings", None)
+    assert cache.lookup("church", 15) == cached_path
+
+
+def test_monument_override_disables_cache(cache, tmp_path, monkeypatch):
+    track = tmp_path / "track.wav"
+    track.write_bytes(b"RIFF")
+    cache.add("church", 15, str(track))
+
+    monkeypatch.setattr(cache, "MONUMENT_OVERRIDES", {"Biserica Neagră": {"enabled": False}})
+    assert cache.lookup("church", 15, monument="Biserica Neagră") is None
+    assert cache.lookup("church", 15) is not None